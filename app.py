@@ -1,10 +1,35 @@
 import streamlit as st
 import openai
+import httpx
+import asyncio
+import copy
+import hashlib
+import importlib.util
+import io
 import json
-import re
-from typing import List, Dict
+import statistics
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
+from llm_common import StreamPreview, cache_key, clear_batch, collect_stream, response_cache
+
+try:
+    import faiss
+    import numpy as np
+except ImportError:  # semantic cache is optional
+    faiss = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import diskcache
+except ImportError:  # generated code then only lives in session state
+    diskcache = None
+
 
 st.set_page_config(
     page_title="AI Agent Task Decomposer",
@@ -12,26 +37,336 @@ st.set_page_config(
     layout="wide"
 )
 
+MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
+# Code generation is structured formatting rather than creative writing
+CODE_TEMPERATURE = 0.2
+
 # Initialize session state
 if 'tasks' not in st.session_state:
     st.session_state.tasks = []
 if 'generated_code' not in st.session_state:
     st.session_state.generated_code = {}
+if 'generated_code_by_key' not in st.session_state:
+    st.session_state.generated_code_by_key = {}
 if 'api_key' not in st.session_state:
     st.session_state.api_key = ''
+if 'model' not in st.session_state:
+    st.session_state.model = MODELS[0]
 
-class CoordinatorAgent:
-    """Main coordinator that breaks down project briefs into tasks"""
+# Tasks per batched request; each gets the full per-task budget up to the model's output limit
+BATCH_SIZE = 4
+MODEL_MAX_OUTPUT_TOKENS = {"gpt-4o-mini": 16384, "gpt-4o": 16384, "gpt-3.5-turbo": 4096}
+
+# Output caps; bounding max_tokens bounds worst-case decode time. The coordinator's answer
+# holds the brief summary plus every task's requirements, so it needs room for large breakdowns
+COORDINATOR_MAX_TOKENS = 3000
+AGENT_MAX_TOKENS = 2000
+AGENT_REDUCED_MAX_TOKENS = 1500
+# Completed generations needed before the agent cap is tuned from observed output lengths
+MIN_TOKEN_SAMPLES = 10
+
+# Transient 429/5xx errors are retried by the SDK with exponential backoff and jitter
+API_MAX_RETRIES = 4
+API_TIMEOUT = httpx.Timeout(60.0)
+# Keep-alive pool so retries and follow-up requests reuse the TLS connection
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20)
+HTTP2 = importlib.util.find_spec('h2') is not None
+
+CODE_CACHE_DIR = './.code_cache'
+CODE_CACHE_TTL = 7*24*60*60
+
+# Upper bound on simultaneous generation requests, keeps bursts under the API rate limit
+MAX_CONCURRENT_REQUESTS = 8
+MAX_TOKEN_SAMPLES = 200
+
+@st.cache_resource
+def get_client(api_key: str) -> openai.OpenAI:
+    """Shared OpenAI client, reused across reruns for the same API key"""
+    return openai.OpenAI(
+        api_key=api_key,
+        max_retries=API_MAX_RETRIES,
+        timeout=API_TIMEOUT,
+        http_client=httpx.Client(http2=HTTP2, limits=HTTP_LIMITS)
+    )
+
+def new_async_client(api_key: str) -> openai.AsyncOpenAI:
+    """Async OpenAI client for a single event loop; close it when the loop's work is done"""
+    return openai.AsyncOpenAI(
+        api_key=api_key,
+        max_retries=API_MAX_RETRIES,
+        timeout=API_TIMEOUT,
+        http_client=httpx.AsyncClient(http2=HTTP2, limits=HTTP_LIMITS)
+    )
+
+@st.cache_resource
+def get_disk_cache():
+    """On-disk store of generated code that survives page reloads and app restarts"""
+    if diskcache is None:
+        return None
+    return diskcache.Cache(CODE_CACHE_DIR)
+
+def persistent_code_key(project_brief: str, model: str, task: Dict) -> str:
+    # Code from another model or agent type isn't interchangeable, so both are part of the key
+    raw = (f"{project_brief}{model}{task.get('agent_type')}"
+           f"{task.get('task_id')}{task.get('title')}{task.get('requirements')}")
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+# Near-duplicate tasks reuse earlier code when their embeddings are this similar
+SEMANTIC_CACHE_THRESHOLD = 0.95
+# Nearest neighbours checked per lookup, so a forgotten top hit doesn't hide the next match
+SEMANTIC_SEARCH_K = 5
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+
+def semantic_cache(agent_name: str, project_context: str) -> Dict:
+    """Per-session embedding index of generated code, one per agent type and project"""
+    if 'sem_cache' not in st.session_state:
+        st.session_state.sem_cache = {}
+    key = (agent_name, cache_key(project_context))
+    if key not in st.session_state.sem_cache:
+        st.session_state.sem_cache[key] = {'index': faiss.IndexFlatIP(EMBEDDING_DIM), 'payloads': []}
+    return st.session_state.sem_cache[key]
+
+async def semantic_lookup(agent, task: Dict, project_context: str):
+    """Find code generated for a near-identical task, returns (code, embedding)"""
+    if faiss is None:
+        return {}, None
     
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    # The project context is shared by every task, so it would drown out what sets tasks apart;
+    # it selects the index instead of being embedded
+    key = f"{task['title']}\n{task['requirements']}"
+    try:
+        response = await agent.client.embeddings.create(model=EMBEDDING_MODEL, input=key)
+    except Exception:
+        # Embedding is only an optimization, fall back to a normal generation
+        return {}, None
     
-    def decompose_project(self, project_brief: str) -> List[Dict]:
-        """Break down project brief into technical tasks"""
-        
-        prompt = f"""You are a technical project coordinator. Given a project brief, break it down into specific, actionable technical tasks.
+    vec = np.array([response.data[0].embedding], dtype='float32')
+    faiss.normalize_L2(vec)
+    
+    cache = semantic_cache(type(agent).__name__, project_context)
+    if cache['index'].ntotal:
+        scores, ids = cache['index'].search(vec, min(SEMANTIC_SEARCH_K, cache['index'].ntotal))
+        # Hits come back best first; skip entries forgotten on regenerate
+        for score, i in zip(scores[0], ids[0]):
+            if score < SEMANTIC_CACHE_THRESHOLD:
+                break
+            payload = cache['payloads'][i]
+            if payload:
+                return copy.deepcopy(payload), vec
+    return {}, vec
+
+def semantic_remember(agent, vec, code: Dict, project_context: str):
+    if vec is None or not code:
+        return
+    cache = semantic_cache(type(agent).__name__, project_context)
+    cache['index'].add(vec)
+    cache['payloads'].append(copy.deepcopy(code))
+
+def semantic_forget(agent, code: Dict, project_context: str):
+    """Stop serving the given code from the semantic cache"""
+    if faiss is None:
+        return
+    payloads = semantic_cache(type(agent).__name__, project_context)['payloads']
+    for i, payload in enumerate(payloads):
+        if payload == code:
+            payloads[i] = None
+
+def match_batch_results(tasks: List[Dict], codes: List[Dict]) -> List[Dict]:
+    """Line up code objects from a batched response with the tasks they belong to"""
+    by_id = {c.get('id'): c for c in codes if isinstance(c, dict) and 'id' in c}
+    results = []
+    for i, _ in enumerate(tasks):
+        code = by_id.get(i + 1)
+        if code is None and i < len(codes) and isinstance(codes[i], dict):
+            code = codes[i]
+        results.append({k: v for k, v in (code or {}).items() if k != 'id'})
+    return results
+
+async def acollect_stream(response, placeholder=None) -> Tuple[str, Optional[str]]:
+    """Async counterpart of collect_stream, also records the response's output token count"""
+    buf, finish_reason = [], None
+    preview = StreamPreview(placeholder)
+    async for chunk in response:
+        if chunk.usage:
+            record_output_tokens(chunk.usage.completion_tokens)
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        if chunk.choices[0].delta.content:
+            buf.append(chunk.choices[0].delta.content)
+            preview.update(buf)
+    preview.update(buf, final=True)
+    return ''.join(buf), finish_reason
+
+def batch_max_tokens(model: str, count: int) -> int:
+    """Output cap for a batched request of count tasks"""
+    return min(AGENT_MAX_TOKENS * count, MODEL_MAX_OUTPUT_TOKENS.get(model, AGENT_MAX_TOKENS))
+
+def record_output_tokens(count: int):
+    samples = st.session_state.setdefault('output_tokens', [])
+    samples.append(count)
+    del samples[:-MAX_TOKEN_SAMPLES]
+
+def agent_max_tokens() -> int:
+    """Per-task output cap, lowered once the P95 of observed outputs fits under the reduced cap"""
+    samples = st.session_state.get('output_tokens', [])
+    if len(samples) >= MIN_TOKEN_SAMPLES:
+        p95 = statistics.quantiles(samples, n=20)[-1]
+        if p95 < AGENT_REDUCED_MAX_TOKENS:
+            return AGENT_REDUCED_MAX_TOKENS
+    return AGENT_MAX_TOKENS
+
+# JSON mode: the model's reply is always a single valid JSON object
+JSON_RESPONSE = {"type": "json_object"}
+
+def parse_code_response(content: str) -> Dict:
+    """Parse the code object from an agent response"""
+    return json_loads(content)
+
+# Static system prompts. They are sent byte-identical on every agent request so OpenAI's
+# automatic prompt caching (prefixes of 1024+ tokens) can reuse them across tasks.
+BACKEND_SYSTEM_PROMPT = """You are an expert backend developer specializing in Python, FastAPI, and SQLite3.
 
-Project Brief: {project_brief}
+Every answer you give is consumed by a program, not read by a person first. Follow this rubric for all generated code.
+
+DATABASE SCHEMA (SQLAlchemy + SQLite3)
+- Use SQLAlchemy 2.0 style declarative models with a shared Base and typed Mapped[...] columns.
+- Give every table an integer primary key named id and created_at/updated_at timestamps with server defaults.
+- Declare foreign keys explicitly with ondelete behaviour, and add relationship() on both sides with back_populates.
+- Add unique constraints and indexes for columns used in lookups, such as emails, usernames and slugs.
+- Use Enum columns for fixed sets of states instead of free-form strings.
+- Never store plain-text passwords; store a hashed_password column only.
+- Include the engine and SessionLocal setup for a local SQLite file, with check_same_thread disabled for FastAPI.
+- Provide a get_db dependency that yields a session and always closes it.
+
+API ENDPOINTS (FastAPI)
+- Group endpoints in an APIRouter with a prefix and tags that match the resource.
+- Define separate Pydantic models for create, update and read payloads; never return ORM objects directly.
+- Use the correct HTTP verbs and status codes: 201 for creation, 204 for deletion, 404 for missing rows, 409 for conflicts.
+- Support pagination on list endpoints with skip and limit query parameters and sensible maximums.
+- Validate path and query parameters with type hints and Query/Path constraints.
+- Raise HTTPException with a clear detail message instead of returning error dictionaries.
+- Keep route handlers thin and delegate work to the business logic layer.
+
+BUSINESS LOGIC
+- Put rules and workflows in plain functions or service classes that take a Session as an argument.
+- Validate inputs before touching the database and raise descriptive exceptions on invalid state.
+- Wrap multi-step writes in a single transaction and roll back on failure.
+- Keep functions small, pure where possible, and free of FastAPI imports so they can be unit tested.
+- Check ownership and permissions before reading or changing another user's data.
+
+AUTHENTICATION AND SECURITY (when the task requires it)
+- Use JWT bearer tokens via OAuth2PasswordBearer, with expiry and a secret read from an environment variable.
+- Hash passwords with passlib's bcrypt context and verify them in constant time.
+- Provide a get_current_user dependency that decodes the token and loads the user, returning 401 on failure.
+- Never log secrets, tokens or passwords, and never hard-code credentials.
+
+ERROR HANDLING AND RELIABILITY
+- Catch database integrity errors and convert them into meaningful HTTP errors.
+- Use the logging module instead of print statements.
+- Handle empty results and missing related rows explicitly.
+
+PERFORMANCE
+- Avoid N+1 queries: load related rows with selectinload or joinedload when a response includes them.
+- Filter, sort and paginate in SQL rather than in Python.
+- Commit once per request rather than inside loops, and use bulk inserts for batches of rows.
+- Keep blocking work out of async endpoints; declare handlers with def when they use a synchronous session.
+
+TESTABILITY
+- Structure code so the database session and current user can be overridden with FastAPI dependency overrides.
+- Keep configuration such as database URL, token expiry and secret keys in a settings object read from the environment.
+- Return plain data from business logic functions so they can be asserted on directly in pytest.
+
+DOCUMENTATION AND STYLE
+- Follow PEP 8, use type hints everywhere and add docstrings to public functions, classes and endpoints.
+- Add short comments that explain intent for any non-obvious logic.
+- Use descriptive names and avoid placeholder code such as pass, TODO or "implement here".
+- Make every snippet complete and importable; include all imports it needs.
+
+DEPENDENCIES
+- List every third-party package the code imports, one per entry, with a minimum version when it matters.
+
+OUTPUT FORMAT
+- Reply with a single valid JSON object and nothing else: no markdown fences, no commentary before or after it.
+- Each code field is a string containing complete source code, with newlines and quotes escaped so the JSON stays valid.
+- Use exactly the keys requested in the user message.
+- If a section does not apply to the task, return a short comment in that field explaining why instead of omitting the key."""
+
+FRONTEND_SYSTEM_PROMPT = """You are an expert frontend developer specializing in React and responsive UI design.
+
+Every answer you give is consumed by a program, not read by a person first. Follow this rubric for all generated code.
+
+MAIN COMPONENT (React)
+- Write function components with hooks only; no class components.
+- Export the main component as the default export and keep helper components in the same snippet.
+- Give components and props descriptive names and document props with JSDoc comments.
+- Keep render logic readable: extract repeated markup into small components and map over arrays with stable keys.
+- Handle loading, empty, error and success states explicitly in the rendered output.
+- Never leave placeholder code such as TODO comments or "implement here".
+
+STYLING
+- Prefer Tailwind CSS utility classes; fall back to a plain CSS module only when the task asks for it.
+- Design mobile first and add responsive breakpoints for tablet and desktop layouts.
+- Use consistent spacing, readable font sizes and sufficient colour contrast (WCAG AA).
+- Give interactive elements visible hover and focus styles.
+
+STATE MANAGEMENT
+- Use useState for local state, useReducer when state transitions are complex, and useEffect only for side effects.
+- Declare effect dependencies completely and clean up subscriptions, timers and in-flight requests.
+- Derive values from state instead of duplicating them; memoize expensive computations with useMemo.
+- Avoid unnecessary re-renders by keeping state as close as possible to where it is used.
+
+API INTEGRATION
+- Put network calls in separate async functions or a custom hook, not inline in JSX handlers.
+- Use fetch with async/await, a configurable base URL and JSON headers.
+- Send the bearer token from storage when the endpoint requires authentication.
+- Check response.ok, parse error bodies and surface a user-friendly message.
+- Abort requests with AbortController when the component unmounts.
+
+FORM VALIDATION (when the task includes forms)
+- Use controlled inputs with labels tied to each field.
+- Validate on submit and on blur, show inline error messages and disable the submit button while a request is pending.
+- Trim input values and validate formats such as email and password length before sending.
+
+ACCESSIBILITY
+- Use semantic HTML elements (button, nav, main, form, label) before reaching for div.
+- Add ARIA attributes only where semantics are not enough, and announce async status changes with aria-live.
+- Make every interaction keyboard accessible with a logical focus order.
+- Provide alt text for images and accessible names for icon-only buttons.
+
+PERFORMANCE
+- Memoize callbacks passed to children with useCallback and list items with React.memo when lists are long.
+- Debounce search and filter inputs before calling the API.
+- Lazy-load heavy, rarely used views with React.lazy and Suspense.
+- Avoid layout shift by reserving space for images and loading skeletons.
+
+TESTABILITY
+- Keep API functions and pure helpers in separately exported functions so they can be mocked and unit tested.
+- Add data-testid attributes only where no accessible role or label can identify an element.
+- Avoid reading globals directly inside components; pass configuration through props or context.
+
+DOCUMENTATION AND STYLE
+- Use modern JavaScript (ES2020+), consistent formatting and meaningful comments for non-obvious logic.
+- Make every snippet complete, including all imports it needs.
+
+DEPENDENCIES
+- List every npm package the code imports, one per entry, with a minimum version when it matters.
+
+OUTPUT FORMAT
+- Reply with a single valid JSON object and nothing else: no markdown fences, no commentary before or after it.
+- Each code field is a string containing complete source code, with newlines and quotes escaped so the JSON stays valid.
+- Use exactly the keys requested in the user message.
+- If a section does not apply to the task, return a short comment in that field explaining why instead of omitting the key."""
+
+# Prompt templates, filled in with str.format; task specifics come last so the shared
+# project text forms a common prefix across requests
+_COORD_PROMPT_TMPL = """You are a technical project coordinator. Given a project brief, break it down into specific, actionable technical tasks.
+
+Project Brief: {brief}
 
 Analyze this project and create a list of tasks. For each task:
 1. Provide a clear task title
@@ -39,16 +374,22 @@ Analyze this project and create a list of tasks. For each task:
 3. Give detailed requirements
 4. List dependencies (if any)
 
-Return your response as a JSON array with this structure:
-[
-    {{
-        "task_id": 1,
-        "title": "Task title",
-        "agent_type": "FRONTEND" or "BACKEND",
-        "requirements": "Detailed description of what needs to be built",
-        "dependencies": []
-    }}
-]
+Also write a summary of the project brief in at most 150 words. It replaces the full brief as
+context for the developers implementing each task, so keep every requirement they need.
+
+Return your response as a JSON object with this structure:
+{{
+    "summary": "Condensed project description",
+    "tasks": [
+        {{
+            "task_id": 1,
+            "title": "Task title",
+            "agent_type": "FRONTEND" or "BACKEND",
+            "requirements": "Detailed description of what needs to be built",
+            "dependencies": []
+        }}
+    ]
+}}
 
 Focus on:
 - User authentication and authorization
@@ -58,47 +399,9 @@ Focus on:
 - Business logic workflows
 - Data validation
 
-Return ONLY the JSON array, no additional text."""
+Return ONLY the JSON object, no additional text."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a technical project coordinator that decomposes projects into tasks."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Extract JSON from response
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            if json_match:
-                tasks = json.loads(json_match.group())
-                return tasks
-            else:
-                return json.loads(content)
-                
-        except Exception as e:
-            st.error(f"Error in coordinator agent: {str(e)}")
-            return []
-
-class BackendAgent:
-    """Backend agent that generates APIs, business logic, and database schemas"""
-    
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
-    
-    def generate_code(self, task: Dict, project_context: str) -> Dict:
-        """Generate backend code including API, business logic, and database schema"""
-        
-        prompt = f"""You are a backend development expert specializing in Python FastAPI and SQLite3.
-
-Project Context: {project_context}
-
-Task: {task['title']}
-Requirements: {task['requirements']}
+_BACKEND_PROMPT_TMPL = """Project Context: {brief}
 
 Generate complete, production-ready code including:
 
@@ -115,55 +418,30 @@ Return your response as a JSON object with this structure:
     "requirements": "List of Python packages needed"
 }}
 
-Make the code:
-- Production-ready with error handling
-- Well-documented with comments
-- Following best practices
-- Scalable and maintainable
-- Include proper validation
+Return ONLY the JSON object.
 
-Return ONLY the JSON object."""
+Task: {title}
+Requirements: {req}"""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert backend developer specializing in Python, FastAPI, and SQLite3."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                code = json.loads(json_match.group())
-                return code
-            else:
-                return json.loads(content)
-                
-        except Exception as e:
-            st.error(f"Error in backend agent: {str(e)}")
-            return {}
+_BACKEND_BATCH_PROMPT_TMPL = """Project Context: {brief}
 
-class FrontendAgent:
-    """Frontend agent that generates React components"""
-    
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
-    
-    def generate_code(self, task: Dict, project_context: str) -> Dict:
-        """Generate React UI components"""
-        
-        prompt = f"""You are a frontend development expert specializing in React and responsive UI design.
+For each task below, return a JSON object whose "results" array has the code object for task i as element i: {{"results": [{{"id": 1, ...}}, {{"id": 2, ...}}]}}
 
-Project Context: {project_context}
+Each code object must have this structure:
+{{
+    "id": 1,
+    "database_schema": "Complete SQLAlchemy models code",
+    "api_endpoints": "Complete FastAPI router code",
+    "business_logic": "Helper functions and business logic",
+    "requirements": "List of Python packages needed"
+}}
 
-Task: {task['title']}
-Requirements: {task['requirements']}
+Return ONLY the JSON object, with exactly {count} elements in "results".
+
+Tasks:
+{tasks}"""
+
+_FRONTEND_PROMPT_TMPL = """Project Context: {brief}
 
 Generate complete, production-ready React components including:
 
@@ -181,39 +459,489 @@ Return your response as a JSON object with this structure:
     "dependencies": "List of npm packages needed"
 }}
 
-Make the code:
-- Responsive and mobile-friendly
-- Accessible (ARIA labels, semantic HTML)
-- Well-documented with comments
-- Following React best practices
-- Include proper error handling
+Return ONLY the JSON object.
+
+Task: {title}
+Requirements: {req}"""
+
+_FRONTEND_BATCH_PROMPT_TMPL = """Project Context: {brief}
+
+For each task below, return a JSON object whose "results" array has the code object for task i as element i: {{"results": [{{"id": 1, ...}}, {{"id": 2, ...}}]}}
+
+Each code object must have this structure:
+{{
+    "id": 1,
+    "component_code": "Complete React component code",
+    "styling": "CSS or Tailwind classes",
+    "api_integration": "API call functions",
+    "dependencies": "List of npm packages needed"
+}}
+
+Return ONLY the JSON object, with exactly {count} elements in "results".
 
-Return ONLY the JSON object."""
+Tasks:
+{tasks}"""
+
+class CoordinatorAgent:
+    """Main coordinator that breaks down project briefs into tasks"""
+    
+    def __init__(self, client: openai.OpenAI, model: str = MODELS[0]):
+        self.client = client
+        self.model = model
+        self.api_key_hash = hash_api_key(client.api_key)
+    
+    def decompose_project(self, project_brief: str, placeholder=None) -> Tuple[List[Dict], str]:
+        """Break down project brief into technical tasks, returns (tasks, brief summary)"""
+        
+        key = cache_key('decompose', self.api_key_hash, self.model, project_brief)
+        cache = response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        prompt = _COORD_PROMPT_TMPL.format(brief=project_brief)
 
         try:
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are an expert frontend developer specializing in React and responsive UI design."},
+                    {"role": "system", "content": "You are a technical project coordinator that decomposes projects into tasks."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=COORDINATOR_MAX_TOKENS,
+                response_format=JSON_RESPONSE,
+                stream=True
             )
             
-            content = response.choices[0].message.content.strip()
+            content, finish_reason = collect_stream(response, placeholder)
+            if finish_reason == "length":
+                st.error(
+                    f"The task breakdown was cut off at {COORDINATOR_MAX_TOKENS} tokens. "
+                    "Try splitting the brief into smaller projects."
+                )
+                return [], ''
             
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                code = json.loads(json_match.group())
-                return code
+            result = json_loads(content)
+            tasks, summary = result.get('tasks', []), result.get('summary', '')
+            
+            if tasks:
+                cache[key] = copy.deepcopy((tasks, summary))
             else:
-                return json.loads(content)
+                st.error("Failed to decompose project. Please try again.")
+            return tasks, summary
+                
+        except Exception as e:
+            st.error(f"Error in coordinator agent: {str(e)}")
+            return [], ''
+
+class BackendAgent:
+    """Backend agent that generates APIs, business logic, and database schemas"""
+    
+    def __init__(self, client: openai.AsyncOpenAI, model: str = MODELS[0]):
+        self.client = client
+        self.model = model
+        self.api_key_hash = hash_api_key(client.api_key)
+    
+    def build_request(self, task: Dict, project_context: str) -> Dict:
+        """Chat completion parameters for a single backend task"""
+        
+        prompt = _BACKEND_PROMPT_TMPL.format(brief=project_context, title=task['title'], req=task['requirements'])
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": BACKEND_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": CODE_TEMPERATURE,
+            "max_tokens": agent_max_tokens(),
+            "response_format": JSON_RESPONSE
+        }
+    
+    async def generate_code(self, task: Dict, project_context: str, placeholder=None) -> Dict:
+        """Generate backend code including API, business logic, and database schema"""
+        
+        cached = cached_code(self, task, project_context)
+        if cached:
+            return cached
+        
+        try:
+            cached, vec = await semantic_lookup(self, task, project_context)
+            if cached:
+                return cached
+            return await generate_fresh(self, task, project_context, vec, placeholder)
+                
+        except Exception as e:
+            st.error(f"Error in backend agent: {str(e)}")
+            return {}
+    
+    async def generate_code_batch(self, tasks: List[Dict], project_context: str) -> Optional[List[Dict]]:
+        """Generate backend code for several tasks in a single request, None if the reply was cut off"""
+        
+        task_list = json.dumps([
+            {"id": i + 1, "title": t['title'], "requirements": t['requirements']}
+            for i, t in enumerate(tasks)
+        ], indent=2)
+        
+        prompt = _BACKEND_BATCH_PROMPT_TMPL.format(brief=project_context, count=len(tasks), tasks=task_list)
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": BACKEND_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=CODE_TEMPERATURE,
+                max_tokens=batch_max_tokens(self.model, len(tasks)),
+                response_format=JSON_RESPONSE
+            )
+            
+            # A reply cut off at the cap is invalid JSON; None tells the caller to split the group
+            if response.choices[0].finish_reason == "length":
+                return None
+            
+            codes = json_loads(response.choices[0].message.content).get('results', [])
+            results = match_batch_results(tasks, codes)
+            for task, code in zip(tasks, results):
+                remember_code(self, task, project_context, code)
+            return results
+                
+        except Exception as e:
+            st.error(f"Error in backend agent: {str(e)}")
+            return [{} for _ in tasks]
+
+class FrontendAgent:
+    """Frontend agent that generates React components"""
+    
+    def __init__(self, client: openai.AsyncOpenAI, model: str = MODELS[0]):
+        self.client = client
+        self.model = model
+        self.api_key_hash = hash_api_key(client.api_key)
+    
+    def build_request(self, task: Dict, project_context: str) -> Dict:
+        """Chat completion parameters for a single frontend task"""
+        
+        prompt = _FRONTEND_PROMPT_TMPL.format(brief=project_context, title=task['title'], req=task['requirements'])
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": FRONTEND_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": CODE_TEMPERATURE,
+            "max_tokens": agent_max_tokens(),
+            "response_format": JSON_RESPONSE
+        }
+    
+    async def generate_code(self, task: Dict, project_context: str, placeholder=None) -> Dict:
+        """Generate React UI components"""
+        
+        cached = cached_code(self, task, project_context)
+        if cached:
+            return cached
+        
+        try:
+            cached, vec = await semantic_lookup(self, task, project_context)
+            if cached:
+                return cached
+            return await generate_fresh(self, task, project_context, vec, placeholder)
                 
         except Exception as e:
             st.error(f"Error in frontend agent: {str(e)}")
             return {}
+    
+    async def generate_code_batch(self, tasks: List[Dict], project_context: str) -> Optional[List[Dict]]:
+        """Generate React UI components for several tasks in a single request, None if the reply was cut off"""
+        
+        task_list = json.dumps([
+            {"id": i + 1, "title": t['title'], "requirements": t['requirements']}
+            for i, t in enumerate(tasks)
+        ], indent=2)
+        
+        prompt = _FRONTEND_BATCH_PROMPT_TMPL.format(brief=project_context, count=len(tasks), tasks=task_list)
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": FRONTEND_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=CODE_TEMPERATURE,
+                max_tokens=batch_max_tokens(self.model, len(tasks)),
+                response_format=JSON_RESPONSE
+            )
+            
+            # A reply cut off at the cap is invalid JSON; None tells the caller to split the group
+            if response.choices[0].finish_reason == "length":
+                return None
+            
+            codes = json_loads(response.choices[0].message.content).get('results', [])
+            results = match_batch_results(tasks, codes)
+            for task, code in zip(tasks, results):
+                remember_code(self, task, project_context, code)
+            return results
+                
+        except Exception as e:
+            st.error(f"Error in frontend agent: {str(e)}")
+            return [{} for _ in tasks]
+
+async def stream_code(agent, task: Dict, project_context: str, placeholder=None) -> str:
+    """Stream an agent's reply for a task, retrying once at the full cap if the tuned cap cut it off"""
+    request = dict(agent.build_request(task, project_context), stream=True, stream_options={"include_usage": True})
+    response = await agent.client.chat.completions.create(**request)
+    content, finish_reason = await acollect_stream(response, placeholder)
+    
+    if finish_reason == "length" and request['max_tokens'] < AGENT_MAX_TOKENS:
+        response = await agent.client.chat.completions.create(**dict(request, max_tokens=AGENT_MAX_TOKENS))
+        content, finish_reason = await acollect_stream(response, placeholder)
+    if finish_reason == "length":
+        raise ValueError(f"Response was cut off at {AGENT_MAX_TOKENS} tokens")
+    return content
+
+async def generate_fresh(agent, task: Dict, project_context: str, vec, placeholder=None) -> Dict:
+    """Generate code for a task that missed both caches, and add it to them"""
+    code = parse_code_response(await stream_code(agent, task, project_context, placeholder))
+    remember_code(agent, task, project_context, code)
+    semantic_remember(agent, vec, code, project_context)
+    return code
+
+def code_cache_key(agent, task: Dict, project_context: str) -> str:
+    # The output cap doesn't change what a complete answer looks like, so it's not part of the key
+    request = {k: v for k, v in agent.build_request(task, project_context).items() if k != 'max_tokens'}
+    return cache_key(type(agent).__name__, agent.api_key_hash, request)
+
+def cached_code(agent, task: Dict, project_context: str) -> Dict:
+    """Previously generated code for the same request, if any"""
+    code = response_cache().get(code_cache_key(agent, task, project_context))
+    return copy.deepcopy(code) if code else {}
+
+def remember_code(agent, task: Dict, project_context: str, code: Dict):
+    if code:
+        response_cache()[code_cache_key(agent, task, project_context)] = copy.deepcopy(code)
+
+def forget_code(agent, task: Dict, project_context: str, code: Dict):
+    response_cache().pop(code_cache_key(agent, task, project_context), None)
+    semantic_forget(agent, code, project_context)
+
+def agent_for(task: Dict, client, model: str = MODELS[0]):
+    """Pick the agent responsible for a task"""
+    if task.get('agent_type') == 'BACKEND':
+        return BackendAgent(client, model)
+    return FrontendAgent(client, model)
+
+# The async client's connection pool is bound to the event loop it was used on, so each
+# asyncio.run gets its own client that is closed when the run finishes.
+async def generate_one(task: Dict, api_key: str, model: str, project_context: str, placeholder=None) -> Dict:
+    """Generate code for a single task"""
+    async with new_async_client(api_key) as client:
+        return await agent_for(task, client, model).generate_code(task, project_context, placeholder)
+
+async def generate_all(tasks: List[Dict], api_key: str, model: str, project_context: str, progress=None) -> List:
+    """Generate code for all given tasks, batching tasks of the same agent type into one request"""
+    async with new_async_client(api_key) as client:
+        return await _generate_all(tasks, client, model, project_context, progress)
+
+async def _generate_all(tasks: List[Dict], client: openai.AsyncOpenAI, model: str, project_context: str, progress=None) -> List:
+    results = [{} for _ in tasks]
+    for i, task in enumerate(tasks):
+        results[i] = cached_code(agent_for(task, client, model), task, project_context)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    # Near-duplicates of earlier tasks are answered from the semantic cache before batching
+    async def lookup(i: int):
+        async with sem:
+            return i, await semantic_lookup(agent_for(tasks[i], client, model), tasks[i], project_context)
+    
+    vecs = {}
+    for i, (code, vec) in await asyncio.gather(*(lookup(i) for i, code in enumerate(results) if not code)):
+        results[i], vecs[i] = code, vec
+    
+    groups = {}
+    for i, task in enumerate(tasks):
+        if not results[i]:
+            groups.setdefault(type(agent_for(task, client, model)), []).append(i)
+    
+    batches = [
+        indices[start:start + BATCH_SIZE]
+        for indices in groups.values()
+        for start in range(0, len(indices), BATCH_SIZE)
+    ]
+    
+    async def run_batch(batch: List[int]):
+        async with sem:
+            try:
+                agent = agent_for(tasks[batch[0]], client, model)
+                codes = await agent.generate_code_batch([tasks[i] for i in batch], project_context)
+                for i, code in zip(batch, codes or []):
+                    semantic_remember(agent, vecs[i], code, project_context)
+                return batch, codes
+            except Exception as e:
+                return batch, e
+    
+    async def run_single(i: int):
+        async with sem:
+            try:
+                agent = agent_for(tasks[i], client, model)
+                return [i], [await generate_fresh(agent, tasks[i], project_context, vecs[i])]
+            except Exception as e:
+                return [i], e
+    
+    # Map batched answers back onto the original task order as each request finishes
+    jobs = {asyncio.ensure_future(run_batch(b)) for b in batches}
+    done, total = 0, len(jobs)
+    while jobs:
+        finished, jobs = await asyncio.wait(jobs, return_when=asyncio.FIRST_COMPLETED)
+        for job in finished:
+            batch, codes = job.result()
+            if codes is None:
+                # A cut-off group is requeued one task per request, under the same concurrency limit
+                jobs |= {asyncio.ensure_future(run_single(i)) for i in batch}
+                total += len(batch)
+            else:
+                for pos, i in enumerate(batch):
+                    results[i] = codes if isinstance(codes, Exception) else codes[pos]
+            done += 1
+        if progress is not None:
+            progress.progress(done / total, text=f"{done}/{total} requests finished")
+    return results
+
+def submit_batch(pending: List, client: openai.OpenAI, model: str, project_context: str) -> str:
+    """Queue code generation for pending tasks through the OpenAI Batch API"""
+    buffer = io.BytesIO()
+    for task_key, task in pending:
+        line = {
+            "custom_id": task_key,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": agent_for(task, client, model).build_request(task, project_context)
+        }
+        buffer.write((json.dumps(line) + "\n").encode("utf-8"))
+    buffer.seek(0)
+    
+    batch_file = client.files.create(file=("batch_requests.jsonl", buffer), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    
+    st.session_state.batch_id = batch.id
+    st.session_state.batch_tasks = dict(pending)
+    return batch.id
+
+def load_batch_results(client, output_file_id: str) -> int:
+    """Download finished batch output into generated code, returns number of tasks loaded"""
+    # Task keys are reused across breakdowns, so only tasks unchanged since submission get results
+    current = {task_key_for(task, i): task for i, task in enumerate(st.session_state.tasks)}
+    loaded = 0
+    for line in client.files.content(output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        
+        record = json_loads(line)
+        task = st.session_state.batch_tasks.get(record.get('custom_id'))
+        body = (record.get('response') or {}).get('body') or {}
+        if task is None or current.get(record.get('custom_id')) != task:
+            continue
+        if record.get('error') or not body.get('choices'):
+            continue
+        
+        try:
+            code = parse_code_response(body['choices'][0]['message']['content'])
+        except ValueError:
+            continue
+        
+        if code:
+            store_generated_code(record['custom_id'], task, code)
+            loaded += 1
+    return loaded
+
+def batch_page():
+    """Track a submitted batch job and collect its results"""
+    st.header("📦 Batch Jobs")
+    
+    batch_id = st.session_state.get('batch_id')
+    if not batch_id:
+        st.info("No batch submitted yet. Use \"Submit as Batch\" on the Generate page.")
+        return
+    
+    try:
+        client = get_client(st.session_state.api_key)
+        batch = client.batches.retrieve(batch_id)
+    except Exception as e:
+        st.error(f"Error checking batch: {str(e)}")
+        return
+    
+    counts = batch.request_counts
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Status", batch.status)
+    col2.metric("Completed", f"{counts.completed}/{counts.total}" if counts else "-")
+    col3.metric("Failed", counts.failed if counts else "-")
+    st.caption(f"Batch ID: `{batch_id}`")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔄 Refresh Status"):
+            st.rerun()
+    with col2:
+        if st.button("✖️ Dismiss Batch", help="Cancel the batch if it is still running and stop tracking it"):
+            try:
+                if batch.status in ("validating", "in_progress", "finalizing"):
+                    client.batches.cancel(batch_id)
+                clear_batch()
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error cancelling batch: {str(e)}")
+    
+    if batch.status == "completed" and batch.output_file_id:
+        if st.button("📥 Load Results", type="primary"):
+            try:
+                loaded = load_batch_results(client, batch.output_file_id)
+                clear_batch()
+                st.success(f"✅ Loaded code for {loaded} tasks!")
+            except Exception as e:
+                st.error(f"Error loading batch results: {str(e)}")
+    elif batch.status in ("failed", "expired", "cancelled"):
+        st.error(f"Batch {batch.status}. Please submit it again.")
+
+def task_key_for(task: Dict, index: int) -> str:
+    """Session state key for a task's generated code"""
+    return f"task_{task.get('task_id', index+1)}"
+
+def dedup_key(task: Dict) -> Tuple[str, str]:
+    """Canonical identity of a task, so near-identical duplicates share one generation"""
+    return (task.get('agent_type'), task.get('title', '').strip().lower())
+
+def store_generated_code(task_key: str, task: Dict, code: Dict, persist: bool = True):
+    """Save generated code for a task in session state, and on disk when available"""
+    entry = {
+        'task': task,
+        'code': code,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    st.session_state.generated_code[task_key] = entry
+    st.session_state.generated_code_by_key[dedup_key(task)] = code
+    
+    disk = get_disk_cache()
+    if persist and disk is not None:
+        key = persistent_code_key(st.session_state.project_brief, st.session_state.model, task)
+        disk.set(key, entry, expire=CODE_CACHE_TTL)
+
+def restore_generated_code(task_key: str, task: Dict) -> bool:
+    """Load code generated for this brief and task in an earlier session, returns True on a hit"""
+    disk = get_disk_cache()
+    if disk is None:
+        return False
+    entry = disk.get(persistent_code_key(st.session_state.project_brief, st.session_state.model, task))
+    if entry is None:
+        return False
+    st.session_state.generated_code[task_key] = entry
+    st.session_state.generated_code_by_key[dedup_key(task)] = entry['code']
+    return True
 
 def main():
     st.title("🤖 AI Agent Task Decomposer")
@@ -233,6 +961,10 @@ def main():
             st.session_state.api_key = api_key
             st.success("API Key set!")
         
+        st.selectbox("Model", MODELS, key="model", help="Model used by all agents")
+        
+        page = st.radio("Page", ["Generate", "Batch Jobs"], horizontal=True)
+        
         # st.markdown("---")
         # st.markdown("### About")
         # st.markdown("""
@@ -246,6 +978,8 @@ def main():
         if st.button("Clear All Tasks", type="secondary"):
             st.session_state.tasks = []
             st.session_state.generated_code = {}
+            st.session_state.generated_code_by_key = {}
+            clear_batch()
             st.rerun()
     
     # Main content
@@ -253,6 +987,10 @@ def main():
         st.warning("⚠️ Please enter your OpenAI API key in the sidebar to continue.")
         return
     
+    if page == "Batch Jobs":
+        batch_page()
+        return
+    
     # Project brief input
     st.header("📝 Step 1: Enter Project Brief")
     project_brief = st.text_area(
@@ -268,29 +1006,100 @@ def main():
     # Decompose project
     if decompose_btn and project_brief:
         with st.spinner("🤔 Analyzing project and breaking down tasks..."):
-            coordinator = CoordinatorAgent(st.session_state.api_key)
-            tasks = coordinator.decompose_project(project_brief)
+            coordinator = CoordinatorAgent(get_client(st.session_state.api_key), st.session_state.model)
+            preview = st.empty()
+            tasks, summary = coordinator.decompose_project(project_brief, preview)
+            preview.empty()
             
             if tasks:
                 st.session_state.tasks = tasks
                 st.session_state.project_brief = project_brief
+                # Agents get the short summary instead of the full brief to keep prompts small
+                st.session_state.project_summary = summary or project_brief
+                # Task keys and duplicate titles only mean the same thing within one project
+                st.session_state.generated_code = {}
+                st.session_state.generated_code_by_key = {}
+                clear_batch()
                 st.success(f"✅ Decomposed into {len(tasks)} tasks!")
-            else:
-                st.error("Failed to decompose project. Please try again.")
     
     # Display tasks
     if st.session_state.tasks:
         st.header("📋 Step 2: Review Tasks")
         
         # Task summary
-        backend_tasks = sum(1 for t in st.session_state.tasks if t.get('agent_type') == 'BACKEND')
-        frontend_tasks = sum(1 for t in st.session_state.tasks if t.get('agent_type') == 'FRONTEND')
+        type_counts = Counter(t.get('agent_type') for t in st.session_state.tasks)
+        backend_tasks, frontend_tasks = type_counts['BACKEND'], type_counts['FRONTEND']
         
         col1, col2, col3 = st.columns(3)
         col1.metric("Total Tasks", len(st.session_state.tasks))
         col2.metric("Backend Tasks", backend_tasks)
         col3.metric("Frontend Tasks", frontend_tasks)
         
+        # Collect tasks still needing code; duplicates of an already generated task reuse its code
+        # and duplicates within the pending set are only sent once
+        pending, seen = [], set()
+        for i, task in enumerate(st.session_state.tasks):
+            task_key = task_key_for(task, i)
+            if task_key in st.session_state.generated_code or restore_generated_code(task_key, task):
+                continue
+            
+            key = dedup_key(task)
+            if key in st.session_state.generated_code_by_key:
+                # Only code generated for this exact task is written to disk
+                store_generated_code(
+                    task_key, task, copy.deepcopy(st.session_state.generated_code_by_key[key]), persist=False
+                )
+            elif key not in seen:
+                seen.add(key)
+                pending.append((task_key, task))
+        
+        # Generate code for every pending task at once
+        col1, col2 = st.columns(2)
+        with col1:
+            generate_all_btn = pending and st.button(f"⚡ Generate All Code ({len(pending)} tasks)", type="primary")
+        with col2:
+            # One batch at a time; a second submission would be paid for and orphan the first
+            submit_batch_btn = pending and not st.session_state.get('batch_id') and st.button(
+                "📦 Submit as Batch (50% cheaper, up to 24h)"
+            )
+        
+        if submit_batch_btn:
+            with st.spinner("Submitting batch job..."):
+                try:
+                    batch_id = submit_batch(
+                        pending,
+                        get_client(st.session_state.api_key),
+                        st.session_state.model,
+                        st.session_state.project_summary
+                    )
+                    st.success(f"✅ Batch `{batch_id}` submitted! Track it on the Batch Jobs page.")
+                except Exception as e:
+                    st.error(f"Error submitting batch: {str(e)}")
+        
+        if generate_all_btn:
+            with st.spinner(f"Generating code for {len(pending)} tasks in parallel..."):
+                progress = st.progress(0.0)
+                results = asyncio.run(generate_all(
+                    [t for _, t in pending],
+                    st.session_state.api_key,
+                    st.session_state.model,
+                    st.session_state.project_summary,
+                    progress
+                ))
+                progress.empty()
+            
+            for (task_key, task), code in zip(pending, results):
+                if isinstance(code, Exception):
+                    st.error(f"Error generating {task.get('title')}: {str(code)}")
+                elif code:
+                    store_generated_code(task_key, task, code)
+                else:
+                    st.warning(f"No code returned for {task.get('title')}, try generating it individually.")
+            
+            # Keep the page as-is if anything failed so the errors stay visible
+            if all(code and not isinstance(code, Exception) for code in results):
+                st.rerun()
+        
         # Display each task
         for i, task in enumerate(st.session_state.tasks):
             with st.expander(f"Task {task.get('task_id', i+1)}: {task.get('title', 'Untitled')}", expanded=False):
@@ -304,84 +1113,103 @@ def main():
                         st.markdown(f"**Dependencies:** {', '.join(map(str, task['dependencies']))}")
                 
                 with col2:
-                    task_key = f"task_{task.get('task_id', i+1)}"
+                    task_key = task_key_for(task, i)
                     
+                    generate_clicked = False
                     if task_key not in st.session_state.generated_code:
-                        if st.button(f"Generate Code", key=f"gen_{task_key}"):
-                            with st.spinner(f"Generating code for {task.get('title')}..."):
-                                if task.get('agent_type') == 'BACKEND':
-                                    agent = BackendAgent(st.session_state.api_key)
-                                else:
-                                    agent = FrontendAgent(st.session_state.api_key)
-                                
-                                code = agent.generate_code(task, st.session_state.project_brief)
-                                
-                                if code:
-                                    st.session_state.generated_code[task_key] = {
-                                        'task': task,
-                                        'code': code,
-                                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    }
-                                    st.rerun()
+                        generate_clicked = st.button(f"Generate Code", key=f"gen_{task_key}")
                     else:
                         st.success("✅ Code Generated")
                         if st.button(f"Regenerate", key=f"regen_{task_key}"):
-                            del st.session_state.generated_code[task_key]
+                            old = st.session_state.generated_code.pop(task_key)
+                            st.session_state.generated_code_by_key.pop(dedup_key(task), None)
+                            if get_disk_cache() is not None:
+                                get_disk_cache().delete(persistent_code_key(
+                                    st.session_state.project_brief, st.session_state.model, task
+                                ))
+                            # Drop the cached response too so the next generation is fresh
+                            forget_code(
+                                agent_for(task, get_client(st.session_state.api_key), st.session_state.model),
+                                task,
+                                st.session_state.project_summary,
+                                old['code']
+                            )
+                            st.rerun()
+                
+                # Stream the response full-width below the task details
+                if generate_clicked:
+                    with st.spinner(f"Generating code for {task.get('title')}..."):
+                        preview = st.empty()
+                        code = asyncio.run(generate_one(
+                            task,
+                            st.session_state.api_key,
+                            st.session_state.model,
+                            st.session_state.project_summary,
+                            preview
+                        ))
+                        
+                        if code:
+                            store_generated_code(task_key, task, code)
                             st.rerun()
     
     # Display generated code
     if st.session_state.generated_code:
         st.header("💻 Step 3: Generated Code")
         
-        for task_key, data in st.session_state.generated_code.items():
-            task = data['task']
-            code = data['code']
+        # Only the selected task is rendered, so syntax highlighting cost doesn't grow with task count
+        generated = st.session_state.generated_code
+        selected = st.selectbox(
+            "Task",
+            list(generated.keys()),
+            format_func=lambda key: generated[key]['task'].get('title', 'Untitled')
+        )
+        data = generated[selected]
+        task = data['task']
+        code = data['code']
+        
+        st.subheader(f"📦 {task.get('title', 'Untitled')}")
+        st.caption(f"Generated at: {data['timestamp']}")
+        
+        if task.get('agent_type') == 'BACKEND':
+            # Backend code display
+            tabs = st.tabs(["Database Schema", "API Endpoints", "Business Logic", "Requirements"])
             
-            st.subheader(f"📦 {task.get('title', 'Untitled')}")
-            st.caption(f"Generated at: {data['timestamp']}")
+            with tabs[0]:
+                st.code(code.get('database_schema', 'No schema generated'), language='python')
             
-            if task.get('agent_type') == 'BACKEND':
-                # Backend code display
-                tabs = st.tabs(["Database Schema", "API Endpoints", "Business Logic", "Requirements"])
-                
-                with tabs[0]:
-                    st.code(code.get('database_schema', 'No schema generated'), language='python')
-                
-                with tabs[1]:
-                    st.code(code.get('api_endpoints', 'No endpoints generated'), language='python')
-                
-                with tabs[2]:
-                    st.code(code.get('business_logic', 'No business logic generated'), language='python')
-                
-                with tabs[3]:
-                    requirements = code.get('requirements', 'No requirements specified')
-                    if isinstance(requirements, list):
-                        st.markdown('\n'.join([f"- {req}" for req in requirements]))
-                    else:
-                        st.text(requirements)
+            with tabs[1]:
+                st.code(code.get('api_endpoints', 'No endpoints generated'), language='python')
             
-            else:
-                # Frontend code display
-                tabs = st.tabs(["Component", "Styling", "API Integration", "Dependencies"])
-                
-                with tabs[0]:
-                    st.code(code.get('component_code', 'No component generated'), language='javascript')
-                
-                with tabs[1]:
-                    styling = code.get('styling', 'No styling provided')
-                    st.code(styling, language='css')
-                
-                with tabs[2]:
-                    st.code(code.get('api_integration', 'No API integration provided'), language='javascript')
-                
-                with tabs[3]:
-                    dependencies = code.get('dependencies', 'No dependencies specified')
-                    if isinstance(dependencies, list):
-                        st.markdown('\n'.join([f"- {dep}" for dep in dependencies]))
-                    else:
-                        st.text(dependencies)
+            with tabs[2]:
+                st.code(code.get('business_logic', 'No business logic generated'), language='python')
+            
+            with tabs[3]:
+                requirements = code.get('requirements', 'No requirements specified')
+                if isinstance(requirements, list):
+                    st.markdown('\n'.join([f"- {req}" for req in requirements]))
+                else:
+                    st.text(requirements)
+        
+        else:
+            # Frontend code display
+            tabs = st.tabs(["Component", "Styling", "API Integration", "Dependencies"])
+            
+            with tabs[0]:
+                st.code(code.get('component_code', 'No component generated'), language='javascript')
+            
+            with tabs[1]:
+                styling = code.get('styling', 'No styling provided')
+                st.code(styling, language='css')
+            
+            with tabs[2]:
+                st.code(code.get('api_integration', 'No API integration provided'), language='javascript')
             
-            st.markdown("---")
+            with tabs[3]:
+                dependencies = code.get('dependencies', 'No dependencies specified')
+                if isinstance(dependencies, list):
+                    st.markdown('\n'.join([f"- {dep}" for dep in dependencies]))
+                else:
+                    st.text(dependencies)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
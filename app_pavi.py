@@ -1,10 +1,40 @@
 import streamlit as st
 import openai
+import httpx
+import asyncio
+import concurrent.futures
+import copy
+import hashlib
+import importlib.util
+import io
 import json
 import re
-from typing import List, Dict
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
+from llm_common import cache_key, clear_batch, collect_stream, response_cache
+
+try:
+    import orjson
+except ImportError:  # exports fall back to the stdlib encoder
+    orjson = None
+
+MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
+# Completion budget for generated code: a base plus a share per description word, capped
+MAX_TOKENS = 2500
+BASE_TOKENS = 800
+TOKENS_PER_WORD = 20
+
+# Upper bound on in-flight OpenAI requests during "Generate All"
+MAX_CONCURRENT_GENERATIONS = 10
+# Generated outputs kept per session; the least recently stored are evicted first
+MAX_CODE_OUTPUTS = 50
+# One pooled connection set shared by every agent, multiplexed over HTTP/2 when h2 is installed
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+HTTP2 = importlib.util.find_spec('h2') is not None
+
 # Page configuration
 st.set_page_config(
     page_title="Project Task Generator",
@@ -14,7 +44,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         font-size: 3rem;
@@ -25,28 +55,6 @@ st.markdown("""
         text-align: center;
         padding: 1rem 0;
     }
-    .task-card {
-        background-color: #f8f9fa;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 4px solid #667eea;
-        margin: 1rem 0;
-    }
-    .agent-badge {
-        display: inline-block;
-        padding: 0.3rem 0.8rem;
-        border-radius: 20px;
-        font-weight: bold;
-        font-size: 0.85rem;
-    }
-    .backend-badge {
-        background-color: #e3f2fd;
-        color: #1976d2;
-    }
-    .frontend-badge {
-        background-color: #f3e5f5;
-        color: #7b1fa2;
-    }
     .stTabs [data-baseweb="tab-list"] {
         gap: 2rem;
     }
@@ -54,41 +62,69 @@ st.markdown("""
         padding: 1rem 2rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+# A style-only st.html block is applied to the page without adding an element
+st.html(_CSS)
 
 # Initialize session state
 if 'task_list' not in st.session_state:
     st.session_state.task_list = []
+if 'tasks_by_category' not in st.session_state:
+    st.session_state.tasks_by_category = {}
 if 'code_outputs' not in st.session_state:
-    st.session_state.code_outputs = {}
+    st.session_state.code_outputs = OrderedDict()
+if 'code_outputs_by_sig' not in st.session_state:
+    st.session_state.code_outputs_by_sig = {}
+if 'model' not in st.session_state:
+    st.session_state.model = MODELS[0]
 if 'openai_key' not in st.session_state:
     st.session_state.openai_key = ''
 if 'project_description' not in st.session_state:
     st.session_state.project_description = ''
+if 'batch_id' not in st.session_state:
+    st.session_state.batch_id = None
+if 'batch_tasks' not in st.session_state:
+    st.session_state.batch_tasks = {}
+
+def split_sections(content: str, pattern: re.Pattern, keys: Dict[str, str]) -> Dict:
+    """Slice content between consecutive section markers, found in a single scan"""
+    result = {key: '' for key in keys.values()}
+    markers = [(m.group(1).upper(), m.start(), m.end()) for m in pattern.finditer(content)]
+    # Each section runs from the end of its marker to the start of the next one
+    ends = [start for _, start, _ in markers[1:]] + [len(content)]
+    for (header, _, body_start), body_end in zip(markers, ends):
+        key = keys[header]
+        if not result[key]:
+            result[key] = content[body_start:body_end].strip()
+    return result
 
 class ProjectCoordinator:
     """Coordinator that analyzes and breaks down projects"""
     
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, http_client: Optional[httpx.Client] = None, model: str = MODELS[0]):
+        self.client = openai.OpenAI(api_key=api_key, http_client=http_client)
+        self.api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        self.model = model
     
-    def analyze_and_breakdown(self, description: str) -> List[Dict]:
+    def analyze_and_breakdown(self, description: str, placeholder=None) -> List[Dict]:
         """Analyze project and create task breakdown"""
         
         system_prompt = """You are an expert software architect. Analyze project descriptions and break them into specific technical tasks.
         
 For each task, determine if it requires backend development (APIs, database, logic) or frontend development (UI, components, user interaction).
 
-Return a JSON array with tasks in this exact format:
-[
-    {
-        "id": 1,
-        "name": "Clear task name",
-        "category": "BACKEND" or "FRONTEND",
-        "description": "Detailed technical requirements",
-        "priority": "High" or "Medium" or "Low"
-    }
-]
+Return a JSON object with the tasks in this exact format:
+{
+    "tasks": [
+        {
+            "id": 1,
+            "name": "Clear task name",
+            "category": "BACKEND" or "FRONTEND",
+            "description": "Detailed technical requirements",
+            "priority": "High" or "Medium" or "Low"
+        }
+    ]
+}
 
 Focus on creating comprehensive, well-defined tasks."""
 
@@ -101,39 +137,67 @@ Break this down into specific technical tasks. Include:
 - UI components and user flows
 - State management and API integration
 
-Return ONLY valid JSON array."""
+Return JSON {{"tasks": [...]}}."""
+
+        key = cache_key('breakdown', self.api_key_hash, self.model, description)
+        cached = response_cache().get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
 
         try:
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.6
+                temperature=0.6,
+                response_format={"type": "json_object"},
+                stream=True
             )
             
-            content = response.choices[0].message.content.strip()
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
+            # JSON mode guarantees a parseable object, so no extraction or lenient parsing is needed
+            content, _ = collect_stream(response, placeholder, language='json')
+            tasks = json.loads(content).get('tasks', [])
             
-            if json_match:
-                return json.loads(json_match.group())
-            return json.loads(content)
+            # Only successful breakdowns are cached so a retry goes back to the API
+            if tasks:
+                response_cache()[key] = copy.deepcopy(tasks)
+            return tasks
                 
         except Exception as e:
             st.error(f"Coordinator error: {str(e)}")
             return []
 
-class BackendDeveloper:
-    """Generates backend code and architecture"""
+@dataclass(frozen=True)
+class DeveloperTemplate:
+    """Everything that differs between the backend and frontend developers"""
+    name: str
+    system: str
+    user_tmpl: str
+    language: str
+    marker: str
+    # (marker header, result key) pairs, in the order the prompt asks for them
+    sections: Tuple[Tuple[str, str], ...]
+    # Smallest completion budget that still fits every section for a short description
+    min_tokens: int = BASE_TOKENS
+    # Result when the model ignored the markers: the whole reply goes under the first
+    # section's key and these fill the rest
+    fallback: Tuple[Tuple[str, str], ...] = ()
+    section_re: re.Pattern = field(init=False, repr=False, compare=False)
+    section_keys: Dict[str, str] = field(init=False, repr=False, compare=False)
     
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
-    
-    def create_implementation(self, task: Dict, context: str) -> Dict:
-        """Create complete backend implementation"""
-        
-        system_prompt = """You are a senior backend engineer specializing in Python, FastAPI, and SQLite.
+    def __post_init__(self):
+        headers = '|'.join(re.escape(header) for header, _ in self.sections)
+        object.__setattr__(self, 'section_re', re.compile(
+            rf'^\s*{re.escape(self.marker)}\s*===\s*({headers})\s*===\s*$',
+            re.IGNORECASE | re.MULTILINE
+        ))
+        object.__setattr__(self, 'section_keys', dict(self.sections))
+
+BACKEND_TMPL = DeveloperTemplate(
+    name="Backend",
+    system="""You are a senior backend engineer specializing in Python, FastAPI, and SQLite.
         
 Generate complete, working Python code - NOT descriptions or placeholders.
 
@@ -141,12 +205,11 @@ Write actual production-ready code with:
 - Full SQLAlchemy models with all fields and relationships
 - Complete FastAPI routes with all CRUD operations
 - Working business logic functions
-- Proper error handling and validation"""
+- Proper error handling and validation""",
+    user_tmpl="""Context: {context}
 
-        user_prompt = f"""Context: {context}
-
-Task: {task['name']}
-Details: {task['description']}
+Task: {name}
+Details: {description}
 
 Generate COMPLETE, WORKING CODE for:
 
@@ -167,74 +230,26 @@ Format your response with clear sections using comments like:
 # === DATABASE MODELS ===
 # === API ROUTES ===
 # === BUSINESS LOGIC ===
-# === DEPENDENCIES ==="""
-
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.5,
-                max_tokens=2500
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Parse the response into sections
-            result = {
-                'models': '',
-                'routes': '',
-                'logic': '',
-                'dependencies': ''
-            }
-            
-            # Try to find sections with markers
-            models_match = re.search(r'#\s*===\s*DATABASE MODELS\s*===\s*(.*?)(?=#\s*===|$)', content, re.DOTALL | re.IGNORECASE)
-            routes_match = re.search(r'#\s*===\s*API ROUTES\s*===\s*(.*?)(?=#\s*===|$)', content, re.DOTALL | re.IGNORECASE)
-            logic_match = re.search(r'#\s*===\s*BUSINESS LOGIC\s*===\s*(.*?)(?=#\s*===|$)', content, re.DOTALL | re.IGNORECASE)
-            deps_match = re.search(r'#\s*===\s*DEPENDENCIES\s*===\s*(.*?)(?=#\s*===|$)', content, re.DOTALL | re.IGNORECASE)
-            
-            if models_match:
-                result['models'] = models_match.group(1).strip()
-            if routes_match:
-                result['routes'] = routes_match.group(1).strip()
-            if logic_match:
-                result['logic'] = logic_match.group(1).strip()
-            if deps_match:
-                result['dependencies'] = deps_match.group(1).strip()
-            
-            # If no sections found, put everything in models as fallback
-            if not any(result.values()):
-                result['models'] = content
-                result['routes'] = "# Code generated above"
-                result['logic'] = "# Code generated above"
-                result['dependencies'] = "# Check requirements above"
-            
-            return result
-                
-        except Exception as e:
-            st.error(f"Backend developer error: {str(e)}")
-            import traceback
-            st.error(traceback.format_exc())
-            return {
-                'models': '# Error generating code',
-                'routes': '# Error generating code',
-                'logic': '# Error generating code',
-                'dependencies': '# Error generating code'
-            }
+# === DEPENDENCIES ===""",
+    language='python',
+    marker='#',
+    sections=(
+        ('DATABASE MODELS', 'models'),
+        ('API ROUTES', 'routes'),
+        ('BUSINESS LOGIC', 'logic'),
+        ('DEPENDENCIES', 'dependencies')
+    ),
+    min_tokens=2000,
+    fallback=(
+        ('routes', "# Code generated above"),
+        ('logic', "# Code generated above"),
+        ('dependencies', "# Check requirements above")
+    )
+)
 
-class FrontendDeveloper:
-    """Generates frontend code and components"""
-    
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
-    
-    def create_implementation(self, task: Dict, context: str) -> Dict:
-        """Create complete frontend implementation"""
-        
-        system_prompt = """You are a senior frontend engineer specializing in modern React development.
+FRONTEND_TMPL = DeveloperTemplate(
+    name="Frontend",
+    system="""You are a senior frontend engineer specializing in modern React development.
 
 Generate complete, working React code - NOT descriptions or placeholders.
 
@@ -242,12 +257,11 @@ Write actual production-ready code with:
 - Full React components with complete JSX
 - All useState and useEffect hooks properly implemented
 - Complete styling code (CSS or Tailwind)
-- Working API integration functions"""
-
-        user_prompt = f"""Context: {context}
+- Working API integration functions""",
+    user_tmpl="""Context: {context}
 
-Task: {task['name']}
-Details: {task['description']}
+Task: {name}
+Details: {description}
 
 Generate COMPLETE, WORKING CODE for:
 
@@ -268,51 +282,458 @@ Format your response with clear sections using comments like:
 // === REACT COMPONENT ===
 // === STYLES ===
 // === HOOKS & API ===
-// === DEPENDENCIES ==="""
+// === DEPENDENCIES ===""",
+    language='javascript',
+    marker='//',
+    sections=(
+        ('REACT COMPONENT', 'component'),
+        ('STYLES', 'styles'),
+        ('HOOKS & API', 'hooks'),
+        ('DEPENDENCIES', 'dependencies')
+    ),
+    min_tokens=1500
+)
 
+class CodeDeveloper:
+    """Generates code for a task, specialised by its DeveloperTemplate"""
+    
+    def __init__(self, api_key: str, template: DeveloperTemplate,
+                 http_client: Optional[httpx.Client] = None, model: str = MODELS[0]):
+        self.client = openai.OpenAI(api_key=api_key, http_client=http_client)
+        self.api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        self.model = model
+        self.tmpl = template
+    
+    def _build_messages(self, task: Dict, context: str) -> List[Dict]:
+        """Build the chat messages for a task"""
+        user_prompt = self.tmpl.user_tmpl.format(
+            context=context,
+            name=task['name'],
+            description=task['description']
+        )
+        return [
+            {"role": "system", "content": self.tmpl.system},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def build_request(self, task: Dict, context: str) -> Dict:
+        """Chat completion parameters for a task, shared by live and batch generation"""
+        return {
+            "model": self.model,
+            "messages": self._build_messages(task, context),
+            "temperature": 0.5,
+            "max_tokens": self._max_tokens(task)
+        }
+    
+    def _max_tokens(self, task: Dict) -> int:
+        """Size the completion budget to the task, so small tasks don't reserve the full cap"""
+        words = len(task.get('description', '').split())
+        return min(MAX_TOKENS, max(self.tmpl.min_tokens, BASE_TOKENS + TOKENS_PER_WORD * words))
+    
+    def _parse_sections(self, content: str) -> Tuple[Dict, bool]:
+        """Split the generated code into its sections, returns (sections, whether any marker had content)"""
+        
+        if not content:
+            return {}, False
+        result = split_sections(content, self.tmpl.section_re, self.tmpl.section_keys)
+        sectioned = any(result.values())
+        
+        # If no sections found, keep the whole reply under the first section
+        if not sectioned:
+            result[self.tmpl.sections[0][1]] = content
+            result.update(self.tmpl.fallback)
+        
+        return result, sectioned
+    
+    def _on_error(self, e: Exception) -> Dict:
+        st.error(f"{self.tmpl.name} developer error: {str(e)}")
+        return {}
+    
+    def _cache_key(self, task: Dict, context: str) -> str:
+        return cache_key(self.tmpl.name, self.api_key_hash, self.model,
+                            task.get('id'), task.get('name'), task.get('description'), context)
+    
+    def _remember(self, key: str, result: Dict, sectioned: bool, finish_reason: Optional[str]):
+        """Cache a parsed reply; empty, marker-less or truncated replies are shown once but not reused"""
+        if finish_reason == 'length':
+            st.warning(f"{self.tmpl.name} code hit the {MAX_TOKENS}-token limit and may be incomplete")
+        elif sectioned:
+            response_cache()[key] = copy.deepcopy(result)
+    
+    def forget(self, task: Dict, context: str):
+        """Drop the cached implementation so the next request regenerates it"""
+        response_cache().pop(self._cache_key(task, context), None)
+    
+    def create_implementation(self, task: Dict, context: str, placeholder=None) -> Dict:
+        """Create a complete implementation, streaming code into placeholder if given"""
+        
+        key = self._cache_key(task, context)
+        cached = response_cache().get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.5,
-                max_tokens=2500
-            )
+            request = self.build_request(task, context)
+            response = self.client.chat.completions.create(**request, stream=True)
+            content, finish_reason = collect_stream(response, placeholder, language=self.tmpl.language)
             
-            content = response.choices[0].message.content.strip()
+            # A reply cut off at the sized budget is retried once at the full cap
+            if finish_reason == 'length' and request['max_tokens'] < MAX_TOKENS:
+                response = self.client.chat.completions.create(**dict(request, max_tokens=MAX_TOKENS), stream=True)
+                content, finish_reason = collect_stream(response, placeholder, language=self.tmpl.language)
             
-            # Parse the response into sections
-            result = {
-                'component': '',
-                'styles': '',
-                'hooks': '',
-                'dependencies': ''
-            }
+            result, sectioned = self._parse_sections(content.strip())
+            self._remember(key, result, sectioned, finish_reason)
+            return result
+                
+        except Exception as e:
+            return self._on_error(e)
+    
+    async def acreate_implementation(self, async_client: openai.AsyncOpenAI, task: Dict, context: str) -> Dict:
+        """Async variant of create_implementation for concurrent generation"""
+        
+        key = self._cache_key(task, context)
+        cached = response_cache().get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        try:
+            request = self.build_request(task, context)
+            response = await async_client.chat.completions.create(**request)
             
-            # Split by section markers
-            sections = {
-                'component': r'//\s*===\s*REACT COMPONENT\s*===\s*(.*?)(?=//\s*===|$)',
-                'styles': r'//\s*===\s*STYLES\s*===\s*(.*?)(?=//\s*===|$)',
-                'hooks': r'//\s*===\s*HOOKS & API\s*===\s*(.*?)(?=//\s*===|$)',
-                'dependencies': r'//\s*===\s*DEPENDENCIES\s*===\s*(.*?)(?=//\s*===|$)'
+            # A reply cut off at the sized budget is retried once at the full cap
+            if response.choices[0].finish_reason == 'length' and request['max_tokens'] < MAX_TOKENS:
+                response = await async_client.chat.completions.create(**dict(request, max_tokens=MAX_TOKENS))
+            
+            content = response.choices[0].message.content.strip()
+            # Parse off the event loop so other in-flight requests are not held up
+            result, sectioned = await asyncio.get_running_loop().run_in_executor(
+                get_pool(), self._parse_sections, content
+            )
+            self._remember(key, result, sectioned, response.choices[0].finish_reason)
+            return result
+                
+        except Exception as e:
+            return self._on_error(e)
+
+class BatchRunner:
+    """Runs task generation through the OpenAI Batch API: half the cost, results within 24h"""
+    
+    def __init__(self, backend_dev: CodeDeveloper, frontend_dev: CodeDeveloper):
+        self.client = backend_dev.client
+        self.backend_dev = backend_dev
+        self.frontend_dev = frontend_dev
+    
+    def _developer_for(self, task: Dict):
+        return self.backend_dev if task.get('category') == 'BACKEND' else self.frontend_dev
+    
+    def submit(self, pending: List[Tuple[str, Dict]], context: str) -> str:
+        """Upload one request per pending task and start the batch, returns the batch id"""
+        buffer = io.BytesIO()
+        for task_key, task in pending:
+            line = {
+                "custom_id": task_key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._developer_for(task).build_request(task, context)
             }
+            buffer.write((json.dumps(line) + "\n").encode("utf-8"))
+        buffer.seek(0)
+        
+        batch_file = self.client.files.create(file=("batch_requests.jsonl", buffer), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def retrieve(self, batch_id: str):
+        return self.client.batches.retrieve(batch_id)
+    
+    def cancel(self, batch_id: str):
+        return self.client.batches.cancel(batch_id)
+    
+    def collect(self, output_file_id: str, tasks: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Parse a finished batch's output into code keyed by task key, skipping failed requests"""
+        results = {}
+        for line in self.client.files.content(output_file_id).text.splitlines():
+            if not line.strip():
+                continue
             
-            for key, pattern in sections.items():
-                match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-                if match:
-                    result[key] = match.group(1).strip()
+            record = json.loads(line)
+            task = tasks.get(record.get('custom_id'))
+            body = (record.get('response') or {}).get('body') or {}
+            if task is None or record.get('error') or not body.get('choices'):
+                continue
             
-            # If no sections found, try to return the whole content
-            if not any(result.values()):
-                result['component'] = content
+            content = (body['choices'][0]['message']['content'] or '').strip()
+            code, _ = self._developer_for(task)._parse_sections(content)
+            if code:
+                results[record['custom_id']] = code
+        return results
+
+def store_code_output(task_key: str, task: Dict, code: Dict):
+    """Save a task's generated code, evicting the oldest outputs beyond MAX_CODE_OUTPUTS"""
+    outputs = st.session_state.code_outputs
+    outputs[task_key] = {
+        'task': task,
+        'code': code,
+        'generated_at': datetime.now().strftime("%H:%M:%S")
+    }
+    outputs.move_to_end(task_key)
+    by_sig = st.session_state.code_outputs_by_sig
+    if task.get('_sig'):
+        by_sig[task['_sig']] = code
+    
+    while len(outputs) > MAX_CODE_OUTPUTS:
+        _, evicted = outputs.popitem(last=False)
+        sig = evicted['task'].get('_sig')
+        if by_sig.get(sig) is evicted['code']:
+            del by_sig[sig]
+
+def task_signature(task: Dict) -> str:
+    """Short content hash identifying near-identical tasks, so duplicates share one generation"""
+    raw = f"{task.get('name', '').lower().strip()}|{task.get('description', '')[:200]}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+def unique_by_signature(pending: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+    """First pending task per signature; the duplicates are linked to its output afterwards"""
+    unique, seen = [], set()
+    for task_key, task in pending:
+        sig = task.get('_sig', task_key)
+        if sig not in seen:
+            seen.add(sig)
+            unique.append((task_key, task))
+    return unique
+
+def clear_old_outputs() -> int:
+    """Drop outputs for tasks that are no longer in the current breakdown, returns how many"""
+    outputs = st.session_state.code_outputs
+    stale = [key for key, output in outputs.items() if output['task'] not in st.session_state.task_list]
+    for key in stale:
+        del outputs[key]
+    
+    # The signature index holds the same code, so it has to let go too for memory to be freed
+    live = {task.get('_sig') for task in st.session_state.task_list}
+    by_sig = st.session_state.code_outputs_by_sig
+    for sig in [sig for sig in by_sig if sig not in live]:
+        del by_sig[sig]
+    return len(stale)
+
+def batch_status_panel(runner: BatchRunner):
+    """Show the submitted batch job's progress and load its results once finished"""
+    batch_id = st.session_state.batch_id
+    try:
+        batch = runner.retrieve(batch_id)
+    except Exception as e:
+        st.error(f"Error checking batch: {str(e)}")
+        return
+    
+    counts = batch.request_counts
+    with st.container():
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("Batch Status", batch.status)
+        col2.metric("Completed", f"{counts.completed}/{counts.total}" if counts else "-")
+        col3.metric("Failed", counts.failed if counts else "-")
+        with col4:
+            if st.button("🔄 Refresh Batch", use_container_width=True):
+                st.rerun()
+        with col5:
+            if st.button("✖️ Dismiss Batch", use_container_width=True,
+                         help="Cancel the batch if it is still running and stop tracking it"):
+                if batch.status in ("validating", "in_progress", "finalizing"):
+                    try:
+                        runner.cancel(batch_id)
+                    except Exception as e:
+                        st.error(f"Error cancelling batch: {str(e)}")
+                        return
+                clear_batch()
+                st.rerun()
+        st.caption(f"Batch ID: `{batch_id}`")
+    
+    if batch.status == "completed" and batch.output_file_id:
+        if st.button("📥 Load Batch Results", type="primary"):
+            try:
+                results = runner.collect(batch.output_file_id, st.session_state.batch_tasks)
+            except Exception as e:
+                st.error(f"Error loading batch results: {str(e)}")
+                return
             
-            return result
+            # Only apply results to tasks that are still the ones the batch was submitted for
+            current = {task_key_for(task, idx): task for idx, task in enumerate(st.session_state.task_list)}
+            loaded = 0
+            for task_key, code in results.items():
+                task = st.session_state.batch_tasks[task_key]
+                if current.get(task_key) == task:
+                    store_code_output(task_key, task, code)
+                    loaded += 1
+            clear_batch()
+            st.success(f"✅ Loaded code for {loaded} tasks!")
+    elif batch.status in ("failed", "expired", "cancelled"):
+        st.error(f"Batch {batch.status}. Please submit it again.")
+
+@st.cache_resource
+def get_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """Worker threads reused across reruns, instead of a fresh default executor per asyncio.run"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS)
+
+@st.cache_resource
+def get_httpx() -> httpx.Client:
+    """Keep-alive HTTP connection pool shared by all OpenAI clients"""
+    return httpx.Client(http2=HTTP2, limits=HTTP_LIMITS)
+
+@st.cache_resource
+def get_clients(api_key: str, model: str) -> Tuple[ProjectCoordinator, CodeDeveloper, CodeDeveloper]:
+    """Shared agents (and their OpenAI clients), reused across reruns for the same API key and model"""
+    http_client = get_httpx()
+    return (
+        ProjectCoordinator(api_key, http_client, model),
+        CodeDeveloper(api_key, BACKEND_TMPL, http_client, model),
+        CodeDeveloper(api_key, FRONTEND_TMPL, http_client, model)
+    )
+
+async def generate_all_implementations(api_key: str, model: str, pending: List[Tuple[str, Dict]], context: str,
+                                       progress=None) -> List[Dict]:
+    """Generate code for every pending task concurrently, bounded by a semaphore"""
+    
+    _, backend_dev, frontend_dev = get_clients(api_key, model)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    
+    # Async connections are bound to this event loop, so the pool lives for one run
+    async_http = httpx.AsyncClient(http2=HTTP2, limits=HTTP_LIMITS)
+    async with openai.AsyncOpenAI(api_key=api_key, http_client=async_http) as async_client:
+        async def gen_one(i: int, task: Dict) -> Tuple[int, Dict]:
+            developer = backend_dev if task.get('category') == 'BACKEND' else frontend_dev
+            async with sem:
+                return i, await developer.acreate_implementation(async_client, task, context)
+        
+        # Collect in task order, reporting progress as each generation finishes
+        results = [{} for _ in pending]
+        jobs = [gen_one(i, task) for i, (_, task) in enumerate(pending)]
+        for done, finished in enumerate(asyncio.as_completed(jobs), start=1):
+            i, results[i] = await finished
+            if progress is not None:
+                progress.progress(done / len(pending), text=f"{done}/{len(pending)} tasks generated")
+        return results
+
+def export_task(task: Dict) -> Dict:
+    """A task without internal bookkeeping fields such as _sig"""
+    return {k: v for k, v in task.items() if not k.startswith('_')}
+
+def export_json(data: Dict) -> bytes:
+    """Encode the export payload as indented JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+def task_key_for(task: Dict, idx: int) -> str:
+    """Key of a task's generated code; idx is the task's position in the full task list"""
+    return f"task_{task.get('id', idx)}"
+
+def index_by_category(tasks: List[Dict]) -> Dict[str, List[int]]:
+    """Group task positions by category once, so filtering is a lookup instead of a scan"""
+    by_category = {'BACKEND': [], 'FRONTEND': []}
+    for idx, task in enumerate(tasks):
+        by_category.setdefault(task.get('category', 'UNKNOWN'), []).append(idx)
+    return by_category
+
+def render_code_output(output: Dict):
+    """Tabbed view of one task's generated code"""
+    task = output['task']
+    code = output['code']
+    
+    if task.get('category') == 'BACKEND':
+        tab1, tab2, tab3, tab4 = st.tabs(["📦 Models", "🛣️ Routes", "⚙️ Logic", "📋 Dependencies"])
+        
+        with tab1:
+            st.code(code.get('models', '# No models generated'), language='python', line_numbers=True)
+        with tab2:
+            st.code(code.get('routes', '# No routes generated'), language='python', line_numbers=True)
+        with tab3:
+            st.code(code.get('logic', '# No logic generated'), language='python', line_numbers=True)
+        with tab4:
+            deps = code.get('dependencies', [])
+            if isinstance(deps, list):
+                st.markdown("```\n" + "\n".join(deps) + "\n```")
+            else:
+                st.code(deps, language='text')
+    else:
+        tab1, tab2, tab3, tab4 = st.tabs(["⚛️ Component", "🎨 Styles", "🔗 Hooks", "📋 Dependencies"])
+        
+        with tab1:
+            st.code(code.get('component', '// No component generated'), language='javascript', line_numbers=True)
+        with tab2:
+            st.code(code.get('styles', '/* No styles generated */'), language='css', line_numbers=True)
+        with tab3:
+            st.code(code.get('hooks', '// No hooks generated'), language='javascript', line_numbers=True)
+        with tab4:
+            deps = code.get('dependencies', [])
+            if isinstance(deps, list):
+                st.markdown("```\n" + "\n".join(deps) + "\n```")
+            else:
+                st.code(deps, language='text')
+
+def forget_task(task: Dict, task_key: str):
+    """Drop a task's generated code and cached response so it can be regenerated"""
+    _, backend_dev, frontend_dev = get_clients(st.session_state.openai_key, st.session_state.model)
+    developer = backend_dev if task.get('category') == 'BACKEND' else frontend_dev
+    developer.forget(task, st.session_state.project_description)
+    st.session_state.code_outputs.pop(task_key, None)
+    st.session_state.code_outputs_by_sig.pop(task.get('_sig'), None)
+
+@st.fragment
+def render_task_card(task: Dict, idx: int):
+    """One task card; its Generate and Regenerate buttons rerun only this fragment"""
+    task_key = task_key_for(task, idx)
+    
+    card = st.container(border=True)
+    with card:
+        col1, col2 = st.columns([4, 1])
+        
+        with col1:
+            category = task.get('category', 'UNKNOWN')
+            
+            st.subheader(f"#{task.get('id', idx)} {task.get('name', 'Task')}")
+            st.badge(category, color='blue' if category == 'BACKEND' else 'violet')
+            st.caption(task.get('description', 'No description'))
+            st.caption(f"Priority: {task.get('priority', 'Medium')}")
+        
+        with col2:
+            action = st.empty()
+    
+    if task_key not in st.session_state.code_outputs:
+        if action.button("⚙️ Generate", key=f"gen_{task_key}", use_container_width=True):
+            with card, st.spinner("Generating code..."):
+                # A duplicate of a task generated since the last full rerun reuses its code
+                code = st.session_state.code_outputs_by_sig.get(task.get('_sig'))
+                if code is None:
+                    _, backend_dev, frontend_dev = get_clients(st.session_state.openai_key, st.session_state.model)
+                    developer = backend_dev if category == 'BACKEND' else frontend_dev
+                    
+                    preview = card.empty()
+                    code = developer.create_implementation(
+                        task, 
+                        st.session_state.project_description,
+                        placeholder=preview
+                    )
+                    preview.empty()
                 
-        except Exception as e:
-            st.error(f"Frontend developer error: {str(e)}")
-            return {}
+                if code:
+                    store_code_output(task_key, task, code)
+    
+    # Rendered after generation so the card updates without another rerun
+    if task_key in st.session_state.code_outputs:
+        with action.container():
+            st.success("✓ Done")
+            st.button("🔄", key=f"regen_{task_key}", use_container_width=True,
+                      on_click=forget_task, args=(task, task_key))
+    
+    # Code lives with its card so a fragment rerun keeps it in sync
+    output = st.session_state.code_outputs.get(task_key)
+    if output:
+        with st.expander(f"📝 {task.get('name', 'Code Output')} - Generated at {output['generated_at']}", expanded=True):
+            render_code_output(output)
 
 def main():
     # Header
@@ -335,12 +756,19 @@ def main():
             st.session_state.openai_key = api_key
             st.success("✓ API Key configured")
         
+        st.selectbox(
+            "🧠 Model",
+            MODELS,
+            key="model",
+            help="gpt-4o-mini is the fastest and cheapest; larger models may write more complete code"
+        )
+        
         st.divider()
         
         st.subheader("📊 Project Stats")
         if st.session_state.task_list:
             total = len(st.session_state.task_list)
-            backend = sum(1 for t in st.session_state.task_list if t.get('category') == 'BACKEND')
+            backend = len(st.session_state.tasks_by_category.get('BACKEND', []))
             frontend = total - backend
             
             col1, col2 = st.columns(2)
@@ -351,14 +779,21 @@ def main():
         
         st.divider()
         
+        if st.button("🧹 Clear Old Outputs", use_container_width=True,
+                     help="Remove generated code for tasks that are not in the current breakdown"):
+            st.toast(f"Removed {clear_old_outputs()} old outputs")
+        
         if st.button("🗑️ Reset Everything", use_container_width=True):
             st.session_state.task_list = []
-            st.session_state.code_outputs = {}
+            st.session_state.tasks_by_category = {}
+            st.session_state.code_outputs = OrderedDict()
+            st.session_state.code_outputs_by_sig = {}
             st.session_state.project_description = ''
+            clear_batch()
             st.rerun()
         
         st.divider()
-        st.caption("Powered by OpenAI GPT-3.5")
+        st.caption(f"Powered by OpenAI {st.session_state.model}")
     
     # Main content
     if not st.session_state.openai_key:
@@ -392,17 +827,26 @@ def main():
         if st.session_state.task_list:
             if st.button("✏️ Edit Tasks", use_container_width=True):
                 st.session_state.task_list = []
-                st.session_state.code_outputs = {}
+                st.session_state.tasks_by_category = {}
+                st.session_state.code_outputs = OrderedDict()
+                st.session_state.code_outputs_by_sig = {}
+                clear_batch()
     
     # Process project
     if analyze_clicked and project_input:
         with st.spinner("🤖 AI is analyzing your project..."):
-            coordinator = ProjectCoordinator(st.session_state.openai_key)
-            tasks = coordinator.analyze_and_breakdown(project_input)
+            coordinator, _, _ = get_clients(st.session_state.openai_key, st.session_state.model)
+            preview = st.empty()
+            tasks = coordinator.analyze_and_breakdown(project_input, placeholder=preview)
+            preview.empty()
             
             if tasks:
+                for task in tasks:
+                    task['_sig'] = task_signature(task)
                 st.session_state.task_list = tasks
+                st.session_state.tasks_by_category = index_by_category(tasks)
                 st.session_state.project_description = project_input
+                clear_batch()
                 st.success(f"✅ Generated {len(tasks)} technical tasks!")
                 st.balloons()
             else:
@@ -420,114 +864,84 @@ def main():
                 ["All Tasks", "Backend Only", "Frontend Only"]
             )
         
-        filtered_tasks = st.session_state.task_list
-        if filter_option == "Backend Only":
-            filtered_tasks = [t for t in st.session_state.task_list if t.get('category') == 'BACKEND']
-        elif filter_option == "Frontend Only":
-            filtered_tasks = [t for t in st.session_state.task_list if t.get('category') == 'FRONTEND']
+        # "Backend Only" -> BACKEND, "All Tasks" falls through to the full list
+        filtered_positions = st.session_state.tasks_by_category.get(
+            filter_option.split()[0].upper(),
+            range(len(st.session_state.task_list))
+        )
         
-        # Display tasks in a grid
-        for idx, task in enumerate(filtered_tasks):
-            task_key = f"task_{task.get('id', idx)}"
+        pending = []
+        for idx, task in enumerate(st.session_state.task_list):
+            task_key = task_key_for(task, idx)
+            if task_key in st.session_state.code_outputs:
+                continue
             
-            with st.container():
-                col1, col2 = st.columns([4, 1])
-                
-                with col1:
-                    category = task.get('category', 'UNKNOWN')
-                    badge_class = 'backend-badge' if category == 'BACKEND' else 'frontend-badge'
-                    
-                    st.markdown(f"""
-                    <div class="task-card">
-                        <div style="display: flex; justify-content: space-between; align-items: center;">
-                            <h3 style="margin: 0;">#{task.get('id', idx)} {task.get('name', 'Task')}</h3>
-                            <span class="agent-badge {badge_class}">{category}</span>
-                        </div>
-                        <p style="color: #666; margin-top: 0.5rem;">{task.get('description', 'No description')}</p>
-                        <small style="color: #999;">Priority: {task.get('priority', 'Medium')}</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    if task_key not in st.session_state.code_outputs:
-                        if st.button("⚙️ Generate", key=f"gen_{task_key}", use_container_width=True):
-                            with st.spinner("Generating code..."):
-                                if category == 'BACKEND':
-                                    developer = BackendDeveloper(st.session_state.openai_key)
-                                else:
-                                    developer = FrontendDeveloper(st.session_state.openai_key)
-                                
-                                code = developer.create_implementation(
-                                    task, 
-                                    st.session_state.project_description
-                                )
-                                
-                                if code:
-                                    st.session_state.code_outputs[task_key] = {
-                                        'task': task,
-                                        'code': code,
-                                        'generated_at': datetime.now().strftime("%H:%M:%S")
-                                    }
-                                    st.rerun()
-                    else:
-                        st.success("✓ Done")
-                        if st.button("🔄", key=f"regen_{task_key}", use_container_width=True):
-                            del st.session_state.code_outputs[task_key]
-                            st.rerun()
-    
-    # Display generated code
-    if st.session_state.code_outputs:
-        st.header("3️⃣ Generated Code")
-        
-        for task_key, output in st.session_state.code_outputs.items():
-            task = output['task']
-            code = output['code']
+            shared = st.session_state.code_outputs_by_sig.get(task.get('_sig'))
+            if shared is not None:
+                store_code_output(task_key, task, shared)
+            else:
+                pending.append((task_key, task))
+        if pending and not st.session_state.batch_id:
+            with col2:
+                submit_batch_clicked = st.button("📦 Submit Batch (50% cheaper, ~24h)", use_container_width=True)
+            with col3:
+                generate_all_clicked = st.button(f"⚡ Generate All ({len(pending)})", type="primary", use_container_width=True)
             
-            with st.expander(f"📝 {task.get('name', 'Code Output')} - Generated at {output['generated_at']}", expanded=True):
-                if task.get('category') == 'BACKEND':
-                    tab1, tab2, tab3, tab4 = st.tabs(["📦 Models", "🛣️ Routes", "⚙️ Logic", "📋 Dependencies"])
-                    
-                    with tab1:
-                        st.code(code.get('models', '# No models generated'), language='python', line_numbers=True)
-                    with tab2:
-                        st.code(code.get('routes', '# No routes generated'), language='python', line_numbers=True)
-                    with tab3:
-                        st.code(code.get('logic', '# No logic generated'), language='python', line_numbers=True)
-                    with tab4:
-                        deps = code.get('dependencies', [])
-                        if isinstance(deps, list):
-                            st.markdown("```\n" + "\n".join(deps) + "\n```")
-                        else:
-                            st.code(deps, language='text')
-                else:
-                    tab1, tab2, tab3, tab4 = st.tabs(["⚛️ Component", "🎨 Styles", "🔗 Hooks", "📋 Dependencies"])
-                    
-                    with tab1:
-                        st.code(code.get('component', '// No component generated'), language='javascript', line_numbers=True)
-                    with tab2:
-                        st.code(code.get('styles', '/* No styles generated */'), language='css', line_numbers=True)
-                    with tab3:
-                        st.code(code.get('hooks', '// No hooks generated'), language='javascript', line_numbers=True)
-                    with tab4:
-                        deps = code.get('dependencies', [])
-                        if isinstance(deps, list):
-                            st.markdown("```\n" + "\n".join(deps) + "\n```")
-                        else:
-                            st.code(deps, language='text')
+            if submit_batch_clicked:
+                _, backend_dev, frontend_dev = get_clients(st.session_state.openai_key, st.session_state.model)
+                unique = unique_by_signature(pending)
+                try:
+                    st.session_state.batch_id = BatchRunner(backend_dev, frontend_dev).submit(
+                        unique,
+                        st.session_state.project_description
+                    )
+                    st.session_state.batch_tasks = dict(unique)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Batch submission error: {str(e)}")
+            
+            if generate_all_clicked:
+                unique = unique_by_signature(pending)
+                progress = st.progress(0.0, text=f"Generating code for {len(unique)} tasks...")
+                results = asyncio.run(generate_all_implementations(
+                    st.session_state.openai_key,
+                    st.session_state.model,
+                    unique,
+                    st.session_state.project_description,
+                    progress
+                ))
+                progress.empty()
+                
+                for (task_key, task), code in zip(unique, results):
+                    if code:
+                        store_code_output(task_key, task, code)
+                # Duplicates are linked to these outputs on the rerun; stay put to keep errors on screen
+                if all(results):
+                    st.rerun()
+        
+        if st.session_state.batch_id:
+            _, backend_dev, frontend_dev = get_clients(st.session_state.openai_key, st.session_state.model)
+            batch_status_panel(BatchRunner(backend_dev, frontend_dev))
+        
+        # Display tasks in a grid
+        for idx in filtered_positions:
+            render_task_card(st.session_state.task_list[idx], idx)
         
         # Download all code button
         st.divider()
         if st.button("📥 Export All Code as JSON", type="secondary"):
             export_data = {
                 'project': st.session_state.project_description,
-                'tasks': st.session_state.task_list,
-                'generated_code': st.session_state.code_outputs,
+                'tasks': [export_task(task) for task in st.session_state.task_list],
+                'generated_code': {
+                    key: dict(output, task=export_task(output['task']))
+                    for key, output in st.session_state.code_outputs.items()
+                },
                 'timestamp': datetime.now().isoformat()
             }
             st.download_button(
                 "⬇️ Download JSON",
-                data=json.dumps(export_data, indent=2),
+                data=export_json(export_data),
                 file_name=f"project_code_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json"
             )
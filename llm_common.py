@@ -0,0 +1,93 @@
+"""Helpers shared by app.py and app_pavi.py: the response cache, request hashing and stream collection"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import streamlit as st
+
+# Responses shared across sessions: each expires on its own, least recently used go first
+RESPONSE_CACHE_TTL = 24*60*60
+RESPONSE_CACHE_MAX_ENTRIES = 500
+
+# Each preview update resends the whole reply so far, so it is redrawn at most this often (seconds)
+STREAM_PREVIEW_INTERVAL = 0.2
+
+class ResponseCache:
+    """Thread-safe LRU of parsed responses where each entry expires on its own"""
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+    
+    def __setitem__(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[1]
+
+@st.cache_resource
+def response_cache() -> ResponseCache:
+    """Parsed model responses keyed by request hash, shared across reruns and sessions"""
+    return ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL)
+
+def cache_key(*parts) -> str:
+    """Stable hash of the inputs that determine a model response"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+class StreamPreview:
+    """Throttled echo of a streamed reply into a placeholder, flushed once more at the end"""
+    
+    def __init__(self, placeholder, language: str = 'json'):
+        self.placeholder = placeholder
+        self.language = language
+        self.last = 0.0
+    
+    def update(self, buf: List[str], final: bool = False):
+        if self.placeholder is None or not buf:
+            return
+        now = time.monotonic()
+        if final or now - self.last >= STREAM_PREVIEW_INTERVAL:
+            self.placeholder.code(''.join(buf), language=self.language)
+            self.last = now
+
+def collect_stream(response, placeholder=None, language: str = 'json') -> Tuple[str, Optional[str]]:
+    """Accumulate a streamed completion into (text, finish reason), echoing it into the placeholder"""
+    buf, finish_reason = [], None
+    preview = StreamPreview(placeholder, language)
+    for chunk in response:
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        if chunk.choices[0].delta.content:
+            buf.append(chunk.choices[0].delta.content)
+            preview.update(buf)
+    preview.update(buf, final=True)
+    return ''.join(buf), finish_reason
+
+def clear_batch():
+    """Stop tracking the submitted Batch API job, so its results can't land on a different breakdown"""
+    st.session_state.batch_id = None
+    st.session_state.batch_tasks = {}